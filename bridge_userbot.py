@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import os
+from lifecycle import lifecycle  # Başlangıç süresi ölçümü için diğer modüllerden önce
 from telethon import TelegramClient, events
 from telethon.tl.types import InputPeerUser
 from config import (
@@ -12,6 +13,7 @@ from config import (
     DAILY_DOWNLOAD_LIMIT,
 )
 from utils import TempFileManager, BotError, logger
+from downloader import download_file
 from database import Database
 
 # Loglama ayarları
@@ -20,32 +22,44 @@ logging.basicConfig(level=logging.INFO)
 # Userbot istemcisi oluşturma
 userbot = TelegramClient('userbot_session', API_ID, API_HASH)
 
-# Veritabanı bağlantısı
+# Veritabanı nesnesi (şema main() içinde, istemci bağlanırken paralel hazırlanır)
 db = Database()
+startup_id = None
 
 # İndirme durumlarını takip etmek için sözlük
 download_tasks = {}
 
 async def init_bot():
 {{ ... }}
-        await TempFileManager.cleanup_temp_files()
+        # Başka süreçte devam eden indirmelerin dosyalarına dokunma
+        await TempFileManager.cleanup_temp_files(max_age=DOWNLOAD_TIMEOUT)
         if userbot.is_connected():
             await userbot.disconnect()
         logger.info("Userbot kapatıldı.")
     except Exception as e:
         logger.error(f"Temizlik sırasında hata: {str(e)}")
 
-async def download_audio(query: str, user_id: int) -> str:
+async def download_audio(query: str, user_id: int, progress_callback=None) -> str:
     """
     Verilen sorgudan müzik aratır, ilk sonucu indirir ve dosya yolunu döndürür.
     
     Args:
         query: Müzik adı veya YouTube linki
         user_id: İndirme yapan kullanıcının ID'si
+        progress_callback: (alınan_bayt, toplam_bayt) ile çağrılan coroutine (isteğe bağlı)
         
     Returns:
         str: İndirilen müzik dosyasının yolu
     """
+    # Kapatma başladıysa yeni indirme alma; başladıysa kapanışta bitmesi beklenir
+    if not lifecycle.track():
+        raise BotError(
+            "Kapatma sürerken yeni indirme istendi",
+            "Bot yeniden başlatılıyor. Lütfen birkaç saniye sonra tekrar deneyin."
+        )
+
+    # Kullanıcı vazgeçerse cancel_download ile iptal edilebilsin
+    download_tasks[user_id] = asyncio.current_task()
 {{ ... }}
         # İndirme işlemini başlat
         async with userbot.conversation(bot_entity, timeout=DOWNLOAD_TIMEOUT) as conv:
@@ -77,17 +91,32 @@ async def download_audio(query: str, user_id: int) -> str:
                     if response.media:
                         # Dosyayı indir
                         temp_file = await TempFileManager.generate_temp_filename(extension='mp3')
-                        await userbot.download_media(response.media, file=temp_file)
+                        result = await download_file(userbot, response, temp_file, progress_callback)
+                        logger.info(
+                            f"İndirme tamamlandı ({result.mode}, {result.workers} bağlantı): "
+                            f"{result.file_size} bayt, {result.elapsed:.1f} sn, "
+                            f"{result.throughput_mbps:.2f} MB/s"
+                        )
                         
                         # Dosya boyutu kontrolü
                         if os.path.exists(temp_file) and os.path.getsize(temp_file) > 1024:  # 1KB'den büyükse
-                            # İndirme sayacını güncelle
-                            await db.increment_download_count(user_id)
+                            # Hız ölçümü yalnızca geçerli dosyalar için; kaydedilemese de indirme başarılı
+                            try:
+                                await db.record_download_metric(
+                                    user_id, result.mode, result.workers, result.part_size,
+                                    result.file_size, result.elapsed
+                                )
+                            except Exception as e:
+                                logger.warning(f"İndirme ölçümü kaydedilemedi: {e}")
                             
-                            # İndirme geçmişine ekle
-                            file_name = f"{getattr(response, 'file', {}).get('name', 'indirilen_muzik')}.mp3"
-                            await db.add_to_history(user_id, file_name)
+                            # İndirme bitti; /cancel artık bu görevi hedeflememeli
+                            if download_tasks.get(user_id) is asyncio.current_task():
+                                del download_tasks[user_id]
                             
+                            # Hak düşümü, geçmiş ve özetler tek işlemde; iptal edilirse hiçbiri
+                            # uygulanmaz ve işlemle dönüş arasında başka bekleme noktası yoktur
+                            file_name = f"{getattr(response, 'file', {}).get('name', 'indirilen_muzik')}.mp3"
+                            await db.record_download(user_id, file_name)
                             return temp_file
                         
                         # Geçersiz dosyayı sil
@@ -113,18 +142,51 @@ async def download_audio(query: str, user_id: int) -> str:
         if not isinstance(e, BotError):
             raise BotError(f"Müzik indirilirken bir hata oluştu: {str(e)}")
         raise
+    finally:
+        if download_tasks.get(user_id) is asyncio.current_task():
+            del download_tasks[user_id]
+
+def cancel_download(user_id: int) -> bool:
+    """Kullanıcının devam eden indirmesini iptal eder. İptal edilecek indirme yoksa False döner."""
+    task = download_tasks.get(user_id)
+    if task is None or task.done():
+        return False
+    task.cancel()
+    return True
+
+async def record_first_update(first_update_after: float):
+    """İlk güncellemeye kadar geçen süreyi başlangıç kaydına ekler."""
+    try:
+        if startup_id is not None:
+            await db.record_first_update(startup_id, first_update_after)
+    except Exception as e:
+        logger.error(f"Başlangıç ölçümü kaydedilemedi: {e}")
+
+@userbot.on(events.Raw)
+async def handle_first_update(update):
+    """İlk güncellemeye kadar geçen süreyi ölçer."""
+    first_update_after = lifecycle.mark_first_update()
+    if first_update_after is not None:
+        await record_first_update(first_update_after)
 
 @userbot.on(events.NewMessage(incoming=True, from_users=OWNER_ID))
 async def handle_owner_message(event):
     """Bot sahibinden gelen mesajları işler."""
+    await lifecycle.ready.wait()
     try:
         if event.message.text.startswith('/'):
             command = event.message.text.split()[0].lower()
             
             if command == '/stats':
-                # İstatistikleri göster
-                stats = await db.get_download_stats(event.sender_id)
-                await event.reply(f"Günlük indirme: {stats[0]}/{DAILY_DOWNLOAD_LIMIT}")
+                # İstatistikleri göster (/stats <user_id> ile başka bir kullanıcı)
+                parts = event.message.text.split()
+                target_id = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else event.sender_id
+                stats = await db.get_download_stats(target_id)
+                total, _, _, _ = await db.get_user_totals(target_id)
+                await event.reply(
+                    f"Günlük indirme: {stats[0]}/{DAILY_DOWNLOAD_LIMIT}\n"
+                    f"Toplam indirme: {total}"
+                )
                 
             elif command == '/premium' and len(event.message.text.split()) > 1:
                 # Premium durumunu güncelle
@@ -141,13 +203,22 @@ async def handle_owner_message(event):
 
 async def main():
     """Ana uygulama döngüsü."""
+    global startup_id
     try:
-        await init_bot()
+        lifecycle.install_signal_handlers()
+        # İstemci bağlantısı ve veritabanı şeması paralel hazırlanır
+        ready_after = await lifecycle.startup(init_bot(), db.init())
+        try:
+            startup_id = await db.record_startup('worker', lifecycle.started_at, ready_after)
+        except Exception as e:
+            logger.error(f"Başlangıç ölçümü kaydedilemedi: {e}")
+        # İlk güncelleme kayıt oluşturulmadan geldiyse şimdi yaz
+        if lifecycle.first_update_after is not None:
+            await record_first_update(lifecycle.first_update_after)
         logger.info("Userbot çalışıyor. Çıkmak için CTRL+C tuşlarına basın.")
         
-        # Botun çalışmasını sürdürmesi için sonsuz döngü
-        while True:
-            await asyncio.sleep(1)
+        # SIGTERM/SIGINT gelip devam eden işler bitene kadar çalış
+        await lifecycle.stopped.wait()
             
     except KeyboardInterrupt:
         logger.info("Kullanıcı tarafından durduruldu.")
@@ -11,6 +11,9 @@ DOWNLOADER_BOT_USERNAME = 'VKmusicTopbot'  # Müzik indiren botun kullanıcı ad
 
 # Veritabanı Ayarları
 DB_NAME = 'music_bot.db'
+HISTORY_RETENTION_DAYS = 30  # Ham indirme geçmişi bu süreden sonra silinir (özetler kalır)
+HISTORY_COMPACTION_INTERVAL = 3600  # 1 saat
+MIGRATION_LOCK_TIMEOUT = 300  # Diğer süreç migration çalıştırırken kilit için beklenecek süre (sn)
 
 # Kullanım Sınırlamaları
 DAILY_DOWNLOAD_LIMIT = 2
@@ -19,3 +22,10 @@ MAX_CONCURRENT_DOWNLOADS = 3
 # Diğer Ayarlar
 TEMP_DIR = 'temp'
 DOWNLOAD_TIMEOUT = 300  # 5 dakika
+SHUTDOWN_DRAIN_TIMEOUT = 25  # Kapanışta devam eden indirmeler için beklenecek süre (Heroku SIGKILL'den önce 30 sn verir)
+
+# Paralel indirme ayarları
+PARALLEL_DOWNLOAD_WORKERS = 4  # 1 yapılırsa Telethon'un sıralı indirmesi kullanılır
+DOWNLOAD_PART_SIZE = 512 * 1024  # 4096'nın katı, en fazla 512 KB ve 1 MB'ı tam bölmeli (4, 8, ..., 512 KB)
+SEQUENTIAL_SAMPLE_RATE = 0.1  # Tam boyutlu indirmelerin bu kadarı hız karşılaştırması için sıralı indirilir
+PROGRESS_UPDATE_INTERVAL = 3  # Durum mesajı en fazla bu kadar saniyede bir güncellenir
@@ -3,7 +3,8 @@ import asyncio
 from datetime import datetime, timedelta
 import aiosqlite
 import logging
-from config import DB_NAME
+from config import DB_NAME, DAILY_DOWNLOAD_LIMIT, HISTORY_RETENTION_DAYS, MIGRATION_LOCK_TIMEOUT
+from migrations import apply_migrations
 
 logger = logging.getLogger(__name__)
 
@@ -11,41 +12,42 @@ class Database:
     _instance = None
     _connection = None
     _lock = asyncio.Lock()
+    _init_future = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Database, cls).__new__(cls)
             cls._instance.db_name = DB_NAME
-            cls._instance._init_db()
         return cls._instance
 
+    async def init(self):
+        """Şemayı hazırlar. İlk çağrıda migration'lar ayrı bir thread'de çalışır, sonrakiler bekler."""
+        if self._init_future is None:
+            loop = asyncio.get_event_loop()
+            self._init_future = loop.run_in_executor(None, self._init_db)
+        future = self._init_future
+        try:
+            await future
+        except Exception:
+            # Başarısız sonucu saklama; sonraki çağrı tekrar denesin
+            if self._init_future is future:
+                self._init_future = None
+            raise
+
     def _init_db(self):
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            # Kullanıcılar tablosu
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                is_premium BOOLEAN DEFAULT 0,
-                daily_downloads INTEGER DEFAULT 0,
-                last_download_date TEXT
-            )
-            ''')
-            
-            # İndirme geçmişi tablosu
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS download_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                file_name TEXT,
-                download_date TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-            ''')
-            conn.commit()
+        # Şema migration'ları (tablolar, indeksler, özet tabloları).
+        # Diğer süreç uzun bir migration çalıştırıyorsa kilit için beklenir.
+        conn = sqlite3.connect(self.db_name, isolation_level=None, timeout=MIGRATION_LOCK_TIMEOUT)
+        try:
+            apply_migrations(conn)
+        finally:
+            conn.close()
 
     async def _get_connection(self):
-        if self._connection is None or self._connection._running:
+        await self.init()
+        # Paylaşılan bağlantı yalnızca kapanmışsa yeniden açılır; açık bir işlemin
+        # ortasında başka bir çağrı bağlantıyı kapatmamalı
+        if self._connection is None or not self._connection._running:
             try:
                 if self._connection:
                     await self._connection.close()
@@ -155,27 +157,246 @@ class Database:
             )
             await db.commit()
 
+    async def _insert_history(self, db, user_id, file_name):
+        """Ham geçmişe kayıt ekler ve özet tablolarını günceller. Açık bir işlem içinde çağrılmalı."""
+        now = datetime.now()
+        timestamp = int(now.timestamp())
+        day = now.strftime('%Y-%m-%d')
+        await db.execute(
+            'INSERT INTO download_history (user_id, file_name, downloaded_at) VALUES (?, ?, ?)',
+            (user_id, file_name, timestamp)
+        )
+
+        # Kullanıcının bugünkü ilk indirmesi mi?
+        cursor = await db.execute(
+            'INSERT OR IGNORE INTO user_daily_stats (user_id, day, downloads) VALUES (?, ?, 0)',
+            (user_id, day)
+        )
+        new_daily_user = cursor.rowcount == 1
+        await db.execute(
+            'UPDATE user_daily_stats SET downloads = downloads + 1 WHERE user_id = ? AND day = ?',
+            (user_id, day)
+        )
+        await db.execute(
+            'INSERT INTO daily_stats (day, downloads, unique_users) VALUES (?, 1, ?) '
+            'ON CONFLICT(day) DO UPDATE SET downloads = downloads + 1, '
+            'unique_users = unique_users + excluded.unique_users',
+            (day, int(new_daily_user))
+        )
+
+        # Kullanıcının ilk indirmesi mi?
+        cursor = await db.execute(
+            'INSERT OR IGNORE INTO user_stats (user_id, total_downloads, first_download_at) VALUES (?, 0, ?)',
+            (user_id, timestamp)
+        )
+        new_user = cursor.rowcount == 1
+        await db.execute(
+            'UPDATE user_stats SET total_downloads = total_downloads + 1, last_download_at = ? WHERE user_id = ?',
+            (timestamp, user_id)
+        )
+        await db.execute(
+            'INSERT INTO global_stats (id, total_downloads, total_users) VALUES (1, 1, ?) '
+            'ON CONFLICT(id) DO UPDATE SET total_downloads = total_downloads + 1, '
+            'total_users = total_users + excluded.total_users',
+            (int(new_user),)
+        )
+
     async def add_to_history(self, user_id, file_name):
-        async with await self._get_connection() as db:
-            await db.execute(
-                'INSERT INTO download_history (user_id, file_name, download_date) VALUES (?, ?, ?)',
-                (user_id, file_name, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            )
-            await db.commit()
+        """Ham geçmişe kayıt ekler ve özet tablolarını aynı işlemde günceller."""
+        async with self._lock:
+            db = await self._get_connection()
+            try:
+                await db.execute('BEGIN')
+                await self._insert_history(db, user_id, file_name)
+                await db.commit()
+            except BaseException as e:
+                # CancelledError da dahil: paylaşılan bağlantı açık işlemde kalmamalı
+                await db.rollback()
+                raise e
+
+    async def record_download(self, user_id, file_name):
+        """
+        Tamamlanan indirmeyi tek işlemde kaydeder: günlük hak düşülür, geçmiş ve
+        özetler güncellenir. İşlem iptal edilirse hiçbiri uygulanmaz.
+        """
+        async with self._lock:
+            db = await self._get_connection()
+            try:
+                await db.execute('BEGIN')
+                await db.execute(
+                    'UPDATE users SET daily_downloads = daily_downloads + 1, last_download_date = ? '
+                    'WHERE user_id = ?',
+                    (datetime.now().strftime('%Y-%m-%d'), user_id)
+                )
+                await self._insert_history(db, user_id, file_name)
+                await db.commit()
+            except BaseException as e:
+                # CancelledError da dahil: paylaşılan bağlantı açık işlemde kalmamalı
+                await db.rollback()
+                raise e
 
     async def get_download_stats(self, user_id):
-        async with await self._get_connection() as db:
-            cursor = await db.execute(
-                'SELECT daily_downloads, last_download_date FROM users WHERE user_id = ?',
-                (user_id,)
-            )
-            result = await cursor.fetchone()
-            return result if result else (0, None)
+        db = await self._get_connection()
+        cursor = await db.execute(
+            'SELECT daily_downloads, last_download_date FROM users WHERE user_id = ?',
+            (user_id,)
+        )
+        result = await cursor.fetchone()
+        return result if result else (0, None)
 
     async def set_premium_status(self, user_id, status):
-        async with await self._get_connection() as db:
-            await db.execute(
-                'UPDATE users SET is_premium = ? WHERE user_id = ?',
-                (status, user_id)
-            )
-            await db.commit()
+        async with self._lock:
+            db = await self._get_connection()
+            try:
+                await db.execute(
+                    'UPDATE users SET is_premium = ? WHERE user_id = ?',
+                    (status, user_id)
+                )
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                raise e
+
+    async def get_user_totals(self, user_id):
+        """Kullanıcının özet istatistiklerini döndürür (toplam, bugün, ilk/son indirme)."""
+        db = await self._get_connection()
+        cursor = await db.execute(
+            'SELECT total_downloads, first_download_at, last_download_at FROM user_stats WHERE user_id = ?',
+            (user_id,)
+        )
+        result = await cursor.fetchone()
+        total, first_at, last_at = result if result else (0, None, None)
+
+        cursor = await db.execute(
+            'SELECT downloads FROM user_daily_stats WHERE user_id = ? AND day = ?',
+            (user_id, datetime.now().strftime('%Y-%m-%d'))
+        )
+        result = await cursor.fetchone()
+        today = result[0] if result else 0
+        return total, today, first_at, last_at
+
+    async def get_global_stats(self):
+        """Genel istatistikleri döndürür (toplam indirme, kullanıcı, bugünkü indirme/kullanıcı)."""
+        db = await self._get_connection()
+        cursor = await db.execute('SELECT total_downloads, total_users FROM global_stats WHERE id = 1')
+        result = await cursor.fetchone()
+        total_downloads, total_users = result if result else (0, 0)
+
+        cursor = await db.execute(
+            'SELECT downloads, unique_users FROM daily_stats WHERE day = ?',
+            (datetime.now().strftime('%Y-%m-%d'),)
+        )
+        result = await cursor.fetchone()
+        today_downloads, today_users = result if result else (0, 0)
+        return total_downloads, total_users, today_downloads, today_users
+
+    async def record_download_metric(self, user_id, mode, workers, part_size, file_size, elapsed):
+        """Bir indirmenin süre ve boyut ölçümünü kaydeder ve mod özetini günceller."""
+        duration_ms = int(elapsed * 1000)
+        async with self._lock:
+            db = await self._get_connection()
+            try:
+                await db.execute('BEGIN')
+                await db.execute(
+                    'INSERT INTO download_metrics '
+                    '(user_id, mode, workers, part_size, file_size, duration_ms, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (user_id, mode, workers, part_size, file_size,
+                     duration_ms, int(datetime.now().timestamp()))
+                )
+                await db.execute(
+                    'INSERT INTO download_metric_stats (mode, downloads, total_bytes, total_ms) '
+                    'VALUES (?, 1, ?, ?) '
+                    'ON CONFLICT(mode) DO UPDATE SET downloads = downloads + 1, '
+                    'total_bytes = total_bytes + excluded.total_bytes, '
+                    'total_ms = total_ms + excluded.total_ms',
+                    (mode, file_size, duration_ms)
+                )
+                await db.commit()
+            except BaseException as e:
+                # CancelledError da dahil: paylaşılan bağlantı açık işlemde kalmamalı
+                await db.rollback()
+                raise e
+
+    async def get_throughput_stats(self):
+        """Ortalama indirme hızını (MB/s) moda göre döndürür: {mode: (adet, hız)}"""
+        db = await self._get_connection()
+        cursor = await db.execute(
+            'SELECT mode, downloads, total_bytes, total_ms FROM download_metric_stats'
+        )
+        stats = {}
+        for mode, count, total_bytes, total_ms in await cursor.fetchall():
+            mbps = (total_bytes / (1024 * 1024)) / (total_ms / 1000) if total_ms else 0.0
+            stats[mode] = (count, mbps)
+        return stats
+
+    async def record_startup(self, process, started_at, ready_after):
+        """Dağıtım başlangıç ölçümünü kaydeder ve kayıt ID'sini döndürür."""
+        async with self._lock:
+            db = await self._get_connection()
+            try:
+                cursor = await db.execute(
+                    'INSERT INTO startup_metrics (process, started_at, ready_ms) VALUES (?, ?, ?)',
+                    (process, int(started_at), int(ready_after * 1000))
+                )
+                await db.commit()
+                return cursor.lastrowid
+            except Exception as e:
+                await db.rollback()
+                raise e
+
+    async def record_first_update(self, startup_id, first_update_after):
+        """Başlangıç kaydına ilk güncellemeye kadar geçen süreyi ekler."""
+        async with self._lock:
+            db = await self._get_connection()
+            try:
+                await db.execute(
+                    'UPDATE startup_metrics SET first_update_ms = ? WHERE id = ?',
+                    (int(first_update_after * 1000), startup_id)
+                )
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                raise e
+
+    async def compact_history(self, retention_days=HISTORY_RETENTION_DAYS, batch_size=1000):
+        """
+        Saklama süresini aşan ham geçmiş ve indirme ölçümü kayıtlarını siler.
+
+        Özet tabloları her indirmede güncellendiği için eski kayıtlar zaten
+        özetlere işlenmiştir; silme işlemi istatistikleri değiştirmez.
+        Kilit uzun süre tutulmasın diye kayıtlar parça parça silinir.
+
+        Returns:
+            int: Silinen kayıt sayısı
+        """
+        cutoff = int((datetime.now() - timedelta(days=retention_days)).timestamp())
+        deleted = 0
+        while True:
+            async with self._lock:
+                db = await self._get_connection()
+                try:
+                    cursor = await db.execute(
+                        'DELETE FROM download_history WHERE id IN ('
+                        'SELECT id FROM download_history WHERE downloaded_at < ? LIMIT ?)',
+                        (cutoff, batch_size)
+                    )
+                    history_deleted = cursor.rowcount
+                    cursor = await db.execute(
+                        'DELETE FROM download_metrics WHERE id IN ('
+                        'SELECT id FROM download_metrics WHERE created_at < ? LIMIT ?)',
+                        (cutoff, batch_size)
+                    )
+                    metrics_deleted = cursor.rowcount
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    raise e
+            deleted += history_deleted + metrics_deleted
+            if history_deleted < batch_size and metrics_deleted < batch_size:
+                break
+            await asyncio.sleep(0)
+
+        if deleted:
+            logger.info(f"Geçmişten {deleted} eski kayıt silindi (>{retention_days} gün)")
+        return deleted
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+from telethon import TelegramClient
+
+from config import (
+    DOWNLOAD_PART_SIZE,
+    PARALLEL_DOWNLOAD_WORKERS,
+    PROGRESS_UPDATE_INTERVAL,
+    SEQUENTIAL_SAMPLE_RATE,
+)
+from utils import logger
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class DownloadResult:
+    """Tamamlanan bir indirmenin ölçümleri."""
+    def __init__(self, file_size: int, elapsed: float, mode: str, workers: int, part_size: int):
+        self.file_size = file_size
+        self.elapsed = elapsed
+        self.mode = mode
+        self.workers = workers
+        self.part_size = part_size
+
+    @property
+    def throughput_mbps(self) -> float:
+        """İndirme hızı (MB/s)."""
+        if self.elapsed <= 0:
+            return 0.0
+        return self.file_size / (1024 * 1024) / self.elapsed
+
+
+class _ThrottledProgress:
+    """İlerleme bildirimlerini en fazla PROGRESS_UPDATE_INTERVAL saniyede bir iletir."""
+    def __init__(self, callback: Optional[ProgressCallback], total: int):
+        self.callback = callback
+        self.total = total
+        self.received = 0
+        self._last_report = 0.0
+
+    async def advance(self, size: int):
+        self.received += size
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if self.received < self.total and now - self._last_report < PROGRESS_UPDATE_INTERVAL:
+            return
+        self._last_report = now
+        try:
+            await self.callback(self.received, self.total)
+        except Exception as e:
+            # Durum mesajı güncellenemese de indirme devam etmeli
+            logger.warning(f"İlerleme bildirilemedi: {e}")
+
+
+async def download_file(
+    client: TelegramClient,
+    message,
+    file_path: str,
+    progress_callback: Optional[ProgressCallback] = None,
+    workers: int = PARALLEL_DOWNLOAD_WORKERS,
+    part_size: int = DOWNLOAD_PART_SIZE,
+) -> DownloadResult:
+    """
+    Mesajdaki medyayı dosya parçalarını paralel çekerek indirir.
+
+    Her işçi dosyanın kendi parçalarını (offset + k * stride) Telethon'un
+    iter_download'u ile ister; dosyanın bulunduğu DC'nin bağlantısını
+    Telethon yönetir. Görev iptal edilirse tüm işçiler durur ve yarım
+    dosya silinir.
+
+    Karşılaştırma için tam boyutlu indirmelerin SEQUENTIAL_SAMPLE_RATE
+    oranındaki kısmı Telethon'un sıralı download_media yolundan geçer
+    ('sequential'). Tek parçalık veya boyutu bilinmeyen dosyalar ayrı
+    ('single') etiketlenir; böylece hızlar benzer dosyalar arasında kıyaslanır.
+
+    Args:
+        client: Bağlı Telethon istemcisi
+        message: Medya içeren mesaj
+        file_path: Dosyanın yazılacağı yol
+        progress_callback: (alınan_bayt, toplam_bayt) ile çağrılan coroutine
+        workers: Paralel işçi sayısı (1 ise sıralı indirme yapılır)
+        part_size: Her istekte çekilen parça boyutu (4096'nın katı, en fazla 512 KB, 1 MB'ı tam bölmeli)
+
+    Returns:
+        DownloadResult: Boyut, süre ve hız bilgileri
+    """
+    # upload.getFile kısıtı: limit 4096'nın katı, en fazla 512 KB ve 1 MB'ı tam bölmeli
+    if part_size % 4096 or part_size > 512 * 1024 or (1024 * 1024) % part_size:
+        raise ValueError(f"Geçersiz parça boyutu: {part_size} (4, 8, 16, ..., 512 KB olmalı)")
+
+    total = getattr(message.file, 'size', None) or 0
+    progress = _ThrottledProgress(progress_callback, total)
+    started = time.monotonic()
+
+    # Boyutu bilinmeyen veya tek parçalık dosyalarda paralellik kazanç sağlamaz
+    if total <= part_size:
+        mode = 'single'
+    elif workers <= 1 or random.random() < SEQUENTIAL_SAMPLE_RATE:
+        mode = 'sequential'
+    else:
+        mode = 'parallel'
+
+    if mode != 'parallel':
+        async def on_progress(received, file_total):
+            progress.total = file_total or progress.total
+            await progress.advance(received - progress.received)
+
+        try:
+            await client.download_media(message, file=file_path, progress_callback=on_progress)
+        except BaseException:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        return DownloadResult(size, time.monotonic() - started, mode, 1, part_size)
+
+    part_count = (total + part_size - 1) // part_size
+    workers = min(workers, part_count)
+    stride = part_size * workers
+
+    with open(file_path, 'wb') as f:
+        f.truncate(total)
+
+    async def worker(index: int, out):
+        offset = index * part_size
+        limit = (part_count - index + workers - 1) // workers
+        async for chunk in client.iter_download(
+            message.media,
+            offset=offset,
+            stride=stride,
+            limit=limit,
+            request_size=part_size,
+            file_size=total,
+        ):
+            out.seek(offset)
+            out.write(chunk)
+            offset += stride
+            await progress.advance(len(chunk))
+
+    with open(file_path, 'r+b') as out:
+        tasks = [asyncio.ensure_future(worker(i, out)) for i in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Bir işçi hata verirse veya indirme iptal edilirse diğerleri de durdurulur
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            out.close()
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+
+    return DownloadResult(total, time.monotonic() - started, 'parallel', workers, part_size)
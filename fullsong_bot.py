@@ -1,29 +1,27 @@
 import asyncio
 import logging
 import os
+from lifecycle import lifecycle  # Başlangıç süresi ölçümü için diğer modüllerden önce
 from aiogram import Bot, Dispatcher, types
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
+from aiogram.dispatcher.middlewares import BaseMiddleware
 from aiogram.types import ParseMode, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils import executor
 
-from config import BOT_TOKEN, OWNER_ID, DAILY_DOWNLOAD_LIMIT, TEMP_DIR
+from config import BOT_TOKEN, OWNER_ID, DAILY_DOWNLOAD_LIMIT, TEMP_DIR, HISTORY_COMPACTION_INTERVAL
 from database import Database
-from utils import TempFileManager, BotError, is_valid_url, format_file_size, logger
+from utils import TempFileManager, BotError, is_valid_url, format_file_size, format_timestamp, logger
 
 # Bot ve dispatcher ayarları
 bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML)
 storage = MemoryStorage()
 dp = Dispatcher(bot, storage=storage)
 
-# Veritabanı bağlantısını oluştur
-try:
-    db = Database()
-    logger.info("Veritabanı bağlantısı başlatıldı")
-except Exception as e:
-    logger.error(f"Veritabanı bağlantı hatası: {str(e)}")
-    raise
+# Veritabanı nesnesi (şema on_startup'ta, diğer kaynaklarla paralel hazırlanır)
+db = Database()
+startup_id = None
 
 # Durumlar
 class DownloadStates(StatesGroup):
@@ -42,8 +40,59 @@ async def delete_temp_file(file_path: str):
     except Exception as e:
         logger.error(f"Dosya silinirken hata: {e}")
 
+async def history_compaction_loop():
+    """Eski indirme geçmişini düzenli aralıklarla özet tablolarına sıkıştırır."""
+    while True:
+        try:
+            await db.compact_history()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Geçmiş sıkıştırılırken hata: {e}")
+        await asyncio.sleep(HISTORY_COMPACTION_INTERVAL)
+
+async def notify_owner():
+    """Bot sahibine başlangıç bildirimi gönderir (başlangıcı bekletmez)."""
+    try:
+        await bot.send_message(OWNER_ID, "🤖 Bot başarıyla başlatıldı!")
+    except Exception as e:
+        logger.error(f"Sahibe başlangıç bildirimi gönderilemedi: {e}")
+
+async def record_first_update(first_update_after: float):
+    """İlk güncellemeye kadar geçen süreyi başlangıç kaydına ekler."""
+    try:
+        if startup_id is not None:
+            await db.record_first_update(startup_id, first_update_after)
+    except Exception as e:
+        logger.error(f"Başlangıç ölçümü kaydedilemedi: {e}")
+
+class LifecycleMiddleware(BaseMiddleware):
+    """İlk güncelleme süresini ölçer ve güncellemeleri kaynaklar hazır olana kadar bekletir."""
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        first_update_after = lifecycle.mark_first_update()
+        await lifecycle.ready.wait()
+        if first_update_after is not None:
+            asyncio.create_task(record_first_update(first_update_after))
+
+dp.middleware.setup(LifecycleMiddleware())
+
 # Komut işleyicileri
-@dp.message_handler(chat_type=types.ChatType.PRIVATE, content_types=types.ContentTypes.TEXT)
+# /cancel ilk sırada ve her durumda (state='*') kayıtlı olmalı; aksi halde
+# genel metin işleyicisi veya waiting_for_link durumu mesajı yakalar
+@dp.message_handler(commands=['cancel'], state='*')
+async def cancel_download_command(message: types.Message):
+    """Kullanıcının devam eden indirmesini iptal eder."""
+    from bridge_userbot import cancel_download
+
+    if not cancel_download(message.from_user.id):
+        await message.answer("ℹ️ Devam eden bir indirmeniz yok.")
+
+# Yalnızca düz metin ve /song; diğer komutlar (/stats, /cancel...) kendi işleyicilerine gider
+@dp.message_handler(
+    lambda message: not message.is_command() or message.get_command(pure=True) == 'song',
+    chat_type=types.ChatType.PRIVATE,
+    content_types=types.ContentTypes.TEXT,
+)
 async def private_chat_handler(message: types.Message, state: FSMContext):
     """Handles private chat messages."""
     # Eğer mesaj bir komut değilse, doğrudan işleme al
@@ -68,6 +117,12 @@ async def process_music_request(message: types.Message, state: FSMContext):
     user_input = message.text.strip()
 {{ ... }}
     
+    # Kapatma başladıysa yeni indirme alma; başladıysa kapanışta bitmesi beklenir
+    if not lifecycle.track():
+        await state.finish()
+        await message.answer("🔄 Bot yeniden başlatılıyor. Lütfen birkaç saniye sonra tekrar deneyin.")
+        return
+    
     # Kullanıcının indirme hakkı var mı kontrol et
     if not await db.can_download(user_id):
         await state.finish()
@@ -88,8 +143,17 @@ async def process_music_request(message: types.Message, state: FSMContext):
         # Kullanıcıya işlem durumunu güncelle
         await processing_msg.edit_text("🔍 Müzik bulunuyor...")
         
+        async def report_progress(received: int, total: int):
+            # downloader bu fonksiyonu PROGRESS_UPDATE_INTERVAL ile sınırlı çağırır
+            if total:
+                await processing_msg.edit_text(
+                    f"📥 Müzik indiriliyor... %{received * 100 // total}\n"
+                    f"{format_file_size(received)} / {format_file_size(total)}\n"
+                    "Vazgeçmek için /cancel yazabilirsiniz."
+                )
+
         # Müziği indir
-        temp_file = await download_audio(user_input, user_id)
+        temp_file = await download_audio(user_input, user_id, progress_callback=report_progress)
         
         if not os.path.exists(temp_file) or os.path.getsize(temp_file) < 1024:  # 1KB'den küçükse geçersiz
             raise BotError("Geçersiz müzik dosyası alındı. Lütfen farklı bir şarkı deneyin.")
@@ -117,6 +181,14 @@ async def process_music_request(message: types.Message, state: FSMContext):
             "Başka bir şarkı indirmek için /download yazabilirsiniz."
         )
         
+    except asyncio.CancelledError:
+        if not lifecycle.accepting:
+            # Kapanış süresi doldu ve drain() işi iptal etti; iptal drain'e iletilmeli
+            await message.answer("🔄 Bot yeniden başlatılıyor. Lütfen birkaç saniye sonra tekrar deneyin.")
+            raise
+        # Kullanıcı /cancel ile indirmeyi iptal etti. Yalnızca cancel_download bu görevi
+        # iptal eder, bu yüzden işleyici normal şekilde tamamlanabilir
+        await message.answer("🚫 İndirme iptal edildi.")
     except BotError as e:
         await message.answer(f"❌ Hata: {e.user_friendly}")
         logger.error(f"Müzik indirilirken hata: {str(e)}")
@@ -143,18 +215,43 @@ async def process_music_request(message: types.Message, state: FSMContext):
 
 @dp.message_handler(commands=['stats'])
 async def show_stats(message: types.Message):
-    """Kullanıcının indirme istatistiklerini gösterir."""
+    """Kullanıcının indirme istatistiklerini gösterir. Sahip için: /stats <user_id>"""
     user_id = message.from_user.id
+    args = message.get_args()
+    if args and is_owner(user_id):
+        try:
+            user_id = int(args.split()[0])
+        except ValueError:
+            await message.answer("Kullanım: /stats <user_id>")
+            return
+
     is_premium = await db.is_premium(user_id)
     daily_downloads, last_download = await db.get_download_stats(user_id)
-    
+    total_downloads, _, first_at, last_at = await db.get_user_totals(user_id)
+
+    title = "İstatistikleriniz" if user_id == message.from_user.id else f"Kullanıcı {user_id}"
     stats_text = (
-        f"📊 <b>İstatistikleriniz</b>\n"
+        f"📊 <b>{title}</b>\n"
         f"🎯 Durum: {'🌟 Premium' if is_premium else '🔹 Standart'}\n"
         f"📥 Bugünkü İndirme: {daily_downloads}/{DAILY_DOWNLOAD_LIMIT}\n"
-        f"⏱ Son İndirme: {last_download if last_download else 'Henüz yok'}"
+        f"📦 Toplam İndirme: {total_downloads}\n"
+        f"⏱ Son İndirme: {format_timestamp(last_at) if last_at else (last_download or 'Henüz yok')}"
     )
-    
+    if first_at:
+        stats_text += f"\n📅 İlk İndirme: {format_timestamp(first_at)}"
+
+    # Sahip kendi istatistiklerine bakıyorsa genel özet de gösterilir
+    if is_owner(message.from_user.id) and not args:
+        total, users, today, today_users = await db.get_global_stats()
+        stats_text += (
+            f"\n\n🌐 <b>Genel</b>\n"
+            f"📦 Toplam İndirme: {total}\n"
+            f"👥 Toplam Kullanıcı: {users}\n"
+            f"📥 Bugün: {today} indirme, {today_users} kullanıcı"
+        )
+        for mode, (count, mbps) in (await db.get_throughput_stats()).items():
+            stats_text += f"\n⚡ {mode}: {mbps:.2f} MB/s ({count} indirme)"
+
     await message.answer(stats_text)
 
 @dp.message_handler(commands=['premium'])
@@ -202,12 +299,40 @@ async def errors_handler(update: types.Update, exception: Exception):
     return True
 
 # Bot başlatma
-async def on_startup(dp):
-    """Bot başlatıldığında çalışır."""
-    await TempFileManager.create_temp_dir()
-    await bot.send_message(OWNER_ID, "🤖 Bot başarıyla başlatıldı!")
+async def stop_polling():
+    """Devam eden işler bittikten sonra executor'ın kapanış adımlarını başlatır."""
+    asyncio.get_event_loop().stop()
+
+async def start_resources():
+    """Kaynakları paralel hazırlar; bitince hazır sinyali güncellemelerin işlenmesine izin verir."""
+    global startup_id
+    try:
+        ready_after = await lifecycle.startup(
+            TempFileManager.create_temp_dir(),
+            db.init(),
+        )
+    except Exception as e:
+        # Hazır olunamazsa süreç kapanır ve platform yeniden başlatır
+        logger.error(f"Başlatma başarısız: {e}", exc_info=True)
+        lifecycle.request_shutdown(on_stop=stop_polling)
+        return
+
+    try:
+        startup_id = await db.record_startup('web', lifecycle.started_at, ready_after)
+    except Exception as e:
+        logger.error(f"Başlangıç ölçümü kaydedilemedi: {e}")
+    # İlk güncelleme kayıt oluşturulmadan geldiyse şimdi yaz
+    if lifecycle.first_update_after is not None:
+        await record_first_update(lifecycle.first_update_after)
+    asyncio.create_task(history_compaction_loop())
     logger.info("Bot başlatıldı.")
 
+async def on_startup(dp):
+    """Bot başlatıldığında çalışır. Kaynaklar arka planda hazırlanır, polling hemen başlar."""
+    lifecycle.install_signal_handlers(on_stop=stop_polling)
+    asyncio.create_task(start_resources())
+    asyncio.create_task(notify_owner())
+
 async def on_shutdown(dp):
     """Bot kapatıldığında çalışır."""
     try:
@@ -240,7 +365,7 @@ if __name__ == '__main__':
     except Exception as e:
         logger.error(f"Bot çalışırken beklenmeyen hata: {str(e)}")
     finally:
-        # Tüm bekleyen görevleri iptal et
+        # Devam eden işler SIGTERM'de zaten beklendi; kalan arka plan görevlerini iptal et
         try:
             loop = asyncio.get_event_loop()
             pending = asyncio.all_tasks(loop=loop)
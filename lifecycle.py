@@ -0,0 +1,130 @@
+import asyncio
+import signal
+import time
+from typing import Awaitable, Callable, Optional, Set
+
+from config import SHUTDOWN_DRAIN_TIMEOUT
+from utils import logger
+
+StopCallback = Callable[[], Awaitable[None]]
+
+
+class Lifecycle:
+    """
+    Süreç yaşam döngüsü yöneticisi.
+
+    Başlangıçta kaynakları paralel başlatıp hazır sinyali verir, çalışan
+    işleri takip eder ve SIGTERM geldiğinde yeni iş almayı bırakıp mevcut
+    işlerin SHUTDOWN_DRAIN_TIMEOUT içinde bitmesini bekler.
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.accepting = True
+        self.ready_after: Optional[float] = None
+        self.first_update_after: Optional[float] = None
+        self._jobs: Set[asyncio.Task] = set()
+        self._ready: Optional[asyncio.Event] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._shutdown_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> asyncio.Event:
+        """Başlangıç tamamlandığında set edilen olay."""
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
+
+    @property
+    def stopped(self) -> asyncio.Event:
+        """Kapatma (drain) tamamlandığında set edilen olay."""
+        if self._stopped is None:
+            self._stopped = asyncio.Event()
+        return self._stopped
+
+    @property
+    def in_flight(self) -> int:
+        """Devam eden iş sayısı."""
+        return len(self._jobs)
+
+    async def startup(self, *initializers: Awaitable) -> float:
+        """
+        Başlatma işlemlerini paralel çalıştırır ve hazır sinyalini verir.
+
+        Returns:
+            float: Süreç başlangıcından hazır olana kadar geçen süre (sn)
+        """
+        await asyncio.gather(*initializers)
+        self.ready_after = time.monotonic() - self._started
+        self.ready.set()
+        logger.info(f"Hazır ({self.ready_after:.2f} sn)")
+        return self.ready_after
+
+    def mark_first_update(self) -> Optional[float]:
+        """İlk güncelleme geldiğinde süreyi kaydeder; sonraki çağrılarda None döner."""
+        if self.first_update_after is not None:
+            return None
+        self.first_update_after = time.monotonic() - self._started
+        logger.info(f"İlk güncelleme alındı ({self.first_update_after:.2f} sn)")
+        return self.first_update_after
+
+    def track(self, task: Optional[asyncio.Task] = None) -> bool:
+        """
+        Görevi kapanışta beklenecek işlere ekler.
+
+        Returns:
+            bool: Kapatma başladıysa False (yeni iş kabul edilmemeli)
+        """
+        if not self.accepting:
+            return False
+        task = task or asyncio.current_task()
+        if task not in self._jobs:
+            self._jobs.add(task)
+            task.add_done_callback(self._jobs.discard)
+        return True
+
+    async def drain(self, timeout: float = SHUTDOWN_DRAIN_TIMEOUT):
+        """Yeni iş almayı durdurur, mevcut işleri bekler; süre dolarsa kalanları iptal eder."""
+        self.accepting = False
+        jobs = {task for task in self._jobs if task is not asyncio.current_task()}
+        if not jobs:
+            return
+
+        logger.info(f"{len(jobs)} işin bitmesi bekleniyor (en fazla {timeout} sn)")
+        _, pending = await asyncio.wait(jobs, timeout=timeout)
+        if pending:
+            logger.warning(f"Süre doldu, {len(pending)} iş iptal ediliyor")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def install_signal_handlers(self, on_stop: Optional[StopCallback] = None):
+        """SIGTERM/SIGINT geldiğinde kontrollü kapanmayı başlatır."""
+        loop = asyncio.get_event_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_shutdown, on_stop)
+            except NotImplementedError:
+                # Windows'ta add_signal_handler desteklenmez
+                logger.warning("Sinyal yakalama desteklenmiyor, kontrollü kapanma devre dışı")
+                return
+
+    def request_shutdown(self, on_stop: Optional[StopCallback] = None):
+        """Kapatmayı başlatır; birden fazla sinyal gelirse yalnızca ilki dikkate alınır."""
+        if self._shutdown_task is not None:
+            return
+        logger.info("Kapatma sinyali alındı, yeni işler kabul edilmiyor")
+        self.accepting = False
+        self._shutdown_task = asyncio.ensure_future(self._shutdown(on_stop))
+
+    async def _shutdown(self, on_stop: Optional[StopCallback]):
+        try:
+            await self.drain()
+        finally:
+            self.stopped.set()
+            if on_stop:
+                await on_stop()
+
+
+# Süreç başına tek yaşam döngüsü (erken import edilmeli, başlangıç zamanı buradan ölçülür)
+lifecycle = Lifecycle()
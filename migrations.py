@@ -0,0 +1,248 @@
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Şema sürümü veritabanında PRAGMA user_version ile tutulur.
+# Her migration bir kez ve sırayla uygulanır; yeni değişiklikler listenin
+# sonuna eklenmelidir, mevcut adımlar asla değiştirilmemelidir.
+
+def _create_base_tables(cursor):
+    """İlk şema: kullanıcılar ve indirme geçmişi tabloları."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        is_premium BOOLEAN DEFAULT 0,
+        daily_downloads INTEGER DEFAULT 0,
+        last_download_date TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS download_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        file_name TEXT,
+        download_date TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )
+    ''')
+
+
+def _integer_timestamps_and_indexes(cursor):
+    """download_history tarihlerini INTEGER (unix epoch) olarak saklar ve indeksler."""
+    cursor.execute('''
+    CREATE TABLE download_history_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        file_name TEXT,
+        downloaded_at INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )
+    ''')
+    # Eski kayıtlar yerel saatle '%Y-%m-%d %H:%M:%S' biçiminde yazılmıştı.
+    # Kullanıcısı veya tarihi okunamayan kayıtlar özetleri bozmasın diye aktarılmaz.
+    # (Bu adım, bu tür kayıtları olan veritabanlarında hiç tamamlanamadığı için
+    # düzeltildi; daha önce tamamlandığı veritabanlarında sonuç aynıdır.)
+    valid = "user_id IS NOT NULL AND strftime('%s', download_date, 'utc') IS NOT NULL"
+    skipped = cursor.execute(
+        f'SELECT COUNT(*) FROM download_history WHERE NOT ({valid})'
+    ).fetchone()[0]
+    if skipped:
+        logger.warning(f"Kullanıcısı veya tarihi geçersiz {skipped} geçmiş kaydı aktarılmadı")
+    cursor.execute(f'''
+    INSERT INTO download_history_new (id, user_id, file_name, downloaded_at)
+    SELECT id, user_id, file_name,
+           CAST(strftime('%s', download_date, 'utc') AS INTEGER)
+    FROM download_history
+    WHERE {valid}
+    ''')
+    cursor.execute('DROP TABLE download_history')
+    cursor.execute('ALTER TABLE download_history_new RENAME TO download_history')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_history_user_time '
+        'ON download_history (user_id, downloaded_at)'
+    )
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_history_time '
+        'ON download_history (downloaded_at)'
+    )
+
+
+def _rollup_tables(cursor):
+    """Günlük ve kullanıcı bazlı özet tablolarını oluşturur ve mevcut geçmişten doldurur."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        day TEXT PRIMARY KEY,
+        downloads INTEGER NOT NULL DEFAULT 0,
+        unique_users INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_daily_stats (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        downloads INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_downloads INTEGER NOT NULL DEFAULT 0,
+        first_download_at INTEGER,
+        last_download_at INTEGER
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS global_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_downloads INTEGER NOT NULL DEFAULT 0,
+        total_users INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+
+    # Mevcut ham kayıtları özetlere aktar
+    cursor.execute('''
+    INSERT INTO user_daily_stats (user_id, day, downloads)
+    SELECT user_id, date(downloaded_at, 'unixepoch', 'localtime'), COUNT(*)
+    FROM download_history
+    GROUP BY user_id, date(downloaded_at, 'unixepoch', 'localtime')
+    ''')
+    cursor.execute('''
+    INSERT INTO daily_stats (day, downloads, unique_users)
+    SELECT day, SUM(downloads), COUNT(*)
+    FROM user_daily_stats
+    GROUP BY day
+    ''')
+    cursor.execute('''
+    INSERT INTO user_stats (user_id, total_downloads, first_download_at, last_download_at)
+    SELECT user_id, COUNT(*), MIN(downloaded_at), MAX(downloaded_at)
+    FROM download_history
+    GROUP BY user_id
+    ''')
+    cursor.execute('''
+    INSERT INTO global_stats (id, total_downloads, total_users)
+    SELECT 1, COALESCE(SUM(total_downloads), 0), COUNT(*)
+    FROM user_stats
+    ''')
+
+
+def _download_metrics(cursor):
+    """İndirme hızlarını (paralel/sıralı) karşılaştırmak için ölçüm tablosu."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS download_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        mode TEXT NOT NULL,
+        workers INTEGER NOT NULL,
+        part_size INTEGER NOT NULL,
+        file_size INTEGER NOT NULL,
+        duration_ms INTEGER NOT NULL,
+        created_at INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_metrics_mode_time '
+        'ON download_metrics (mode, created_at)'
+    )
+
+
+def _startup_metrics(cursor):
+    """Her dağıtımda hazır olma ve ilk güncelleme sürelerini saklayan tablo."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS startup_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        process TEXT NOT NULL,
+        started_at INTEGER NOT NULL,
+        ready_ms INTEGER NOT NULL,
+        first_update_ms INTEGER
+    )
+    ''')
+
+
+def _download_metric_rollups(cursor):
+    """Moda göre indirme hızı özet tablosu; ham ölçümler saklama süresinden sonra silinir."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS download_metric_stats (
+        mode TEXT PRIMARY KEY,
+        downloads INTEGER NOT NULL DEFAULT 0,
+        total_bytes INTEGER NOT NULL DEFAULT 0,
+        total_ms INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    INSERT INTO download_metric_stats (mode, downloads, total_bytes, total_ms)
+    SELECT mode, COUNT(*), SUM(file_size), SUM(duration_ms)
+    FROM download_metrics
+    GROUP BY mode
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_metrics_time '
+        'ON download_metrics (created_at)'
+    )
+
+
+def _single_part_metric_mode(cursor):
+    """Tek parçalık indirmeleri 'sequential' yerine 'single' olarak ayırır."""
+    count, total_bytes, total_ms = cursor.execute('''
+    SELECT COUNT(*), COALESCE(SUM(file_size), 0), COALESCE(SUM(duration_ms), 0)
+    FROM download_metrics
+    WHERE mode = 'sequential' AND file_size <= part_size
+    ''').fetchone()
+    if not count:
+        return
+    cursor.execute(
+        "UPDATE download_metrics SET mode = 'single' "
+        "WHERE mode = 'sequential' AND file_size <= part_size"
+    )
+    cursor.execute(
+        "UPDATE download_metric_stats SET downloads = downloads - ?, "
+        "total_bytes = total_bytes - ?, total_ms = total_ms - ? WHERE mode = 'sequential'",
+        (count, total_bytes, total_ms)
+    )
+    cursor.execute(
+        "INSERT INTO download_metric_stats (mode, downloads, total_bytes, total_ms) "
+        "VALUES ('single', ?, ?, ?)",
+        (count, total_bytes, total_ms)
+    )
+
+
+def _drop_metric_mode_index(cursor):
+    """Özet tablosundan sonra kullanılmayan mod indeksini kaldırır (ekleme maliyeti)."""
+    cursor.execute('DROP INDEX IF EXISTS idx_metrics_mode_time')
+
+
+MIGRATIONS = [
+    _create_base_tables,
+    _integer_timestamps_and_indexes,
+    _rollup_tables,
+    _download_metrics,
+    _startup_metrics,
+    _download_metric_rollups,
+    _single_part_metric_mode,
+    _drop_metric_mode_index,
+]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Bekleyen migration'ları sırayla uygular ve güncel şema sürümünü döndürür."""
+    while True:
+        cursor = conn.cursor()
+        # IMMEDIATE: iki süreç aynı anda başlarsa yazma kilidi sırayla alınır,
+        # sürüm kilit altında tekrar okunduğu için bir adım iki kez uygulanmaz
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if version >= len(MIGRATIONS):
+                cursor.execute('COMMIT')
+                return version
+            migration = MIGRATIONS[version]
+            migration(cursor)
+            # PRAGMA parametre kabul etmez; sürüm bir tam sayı olduğu için güvenli
+            cursor.execute(f'PRAGMA user_version = {version + 1}')
+            cursor.execute('COMMIT')
+            logger.info(f"Veritabanı şeması {version + 1}. sürüme yükseltildi: {migration.__name__}")
+        except Exception as e:
+            cursor.execute('ROLLBACK')
+            logger.error(f"Migration {version + 1} uygulanamadı: {str(e)}")
+            raise
@@ -34,16 +34,25 @@ class TempFileManager:
         return os.path.join(TEMP_DIR, f"temp_{timestamp}_{random_str}.{extension}")
 
     @staticmethod
-    async def cleanup_temp_files():
-        """Geçici klasördeki tüm dosyaları siler."""
+    async def cleanup_temp_files(max_age: Optional[float] = None):
+        """
+        Geçici klasördeki dosyaları siler.
+
+        max_age verilirse yalnızca son max_age saniyede değiştirilmemiş dosyalar
+        silinir; böylece başka bir süreçte devam eden indirmeler korunur.
+        """
         try:
             if not await aiofiles.os.path.exists(TEMP_DIR):
                 return
                 
+            now = datetime.now().timestamp()
             async for filename in aiofiles.os.scandir(TEMP_DIR):
                 try:
-                    if filename.is_file():
-                        await aiofiles.os.remove(filename.path)
+                    if not filename.is_file():
+                        continue
+                    if max_age is not None and now - filename.stat().st_mtime < max_age:
+                        continue
+                    await aiofiles.os.remove(filename.path)
                 except Exception as e:
                     logger.error(f"{filename} silinirken hata: {e}")
             
@@ -73,6 +82,10 @@ def format_file_size(size_bytes: int) -> str:
         size_bytes /= 1024.0
     return f"{size_bytes:.1f} TB"
 
+def format_timestamp(timestamp: int) -> str:
+    """Unix zaman damgasını yerel tarih/saat metnine çevirir."""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
 # Kullanıcı giriş doğrulama
 def is_valid_url(url: str) -> bool:
     """Verilen metnin geçerli bir URL olup olmadığını kontrol eder."""